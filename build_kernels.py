@@ -0,0 +1,34 @@
+"""
+build_kernels.py
+Ahead-of-time compile the batch kernels from demo28.py into the `ai_prescribe_kernels`
+extension module (numba.pycc), so PatientBatch skips JIT compilation on first call.
+demo28 ignores the build once the kernel sources change; rerun this script then.
+
+Usage: python build_kernels.py   (requires numba and a C compiler)
+"""
+
+import sys
+
+# compile from the JIT sources even if an earlier AOT build is importable
+sys.modules["ai_prescribe_kernels"] = None
+
+from numba.pycc import CC
+
+import demo28
+
+SOURCE_HASH = demo28._kernel_source_hash()
+
+cc = CC("ai_prescribe_kernels")
+
+# argument types follow PatientBatch: age int16, weight/scr float64, sex_female bool
+cc.export("crcl_batch", "void(i2[:], f8[:], f8[:], b1[:], f8[:])")(demo28.estimate_crcl_batch.py_func)
+cc.export("categorize_egfr_batch", "i8[:](f8[:])")(demo28.categorize_egfr_batch.py_func)
+
+
+@cc.export("source_hash", "i8()")
+def source_hash():
+    return SOURCE_HASH
+
+
+if __name__ == "__main__":
+    cc.compile()
@@ -6,14 +6,45 @@ NOT FOR CLINICAL USE. Always require clinician review/sign-off.
 """
 
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Optional, Dict, Any, Collection, FrozenSet, Iterable, Mapping, Tuple
 import datetime
+import hashlib
+import inspect
 import math
+import sys
+import warnings
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; the kernels then run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+    prange = range
+
+try:
+    import ahocorasick  # pyahocorasick
+except ImportError:  # optional; check_allergy falls back to substring tests
+    ahocorasick = None
+_AUTOMATON_MIN_ALLERGIES = 32
+
+# ----------------------------
+# eGFR categories (index into Medication.renal_adjustment_vec)
+# ----------------------------
+EGFR_HIGH, EGFR_MID, EGFR_LOW = 0, 1, 2
+EGFR_UNKNOWN = -1  # batch APIs only; the scalar API uses None
+EGFR_LABELS = ("eGFR>=50", "30-49", "<30")  # renal_adjustment keys per category
+N_EGFR_CATS = len(EGFR_LABELS)
 
 # ----------------------------
 # Data models
 # ----------------------------
-@dataclass
+@dataclass(slots=True)
 class Patient:
     id: str
     age: int            # years
@@ -23,8 +54,38 @@ class Patient:
     serum_creatinine_mg_dl: Optional[float] = None
     allergies: List[str] = field(default_factory=list)
     pregnancy_status: Optional[bool] = None  # True/False/None
+    # allergies as last seen by the caches below, so later edits to the list are picked up
+    _allergies_src: Optional[Tuple[str, ...]] = field(init=False, repr=False, compare=False, default=None)
+    # lowercased allergies, cached for the safety checks
+    _allergies_lower: Tuple[str, ...] = field(init=False, repr=False, compare=False, default=())
+    # Aho-Corasick automaton over _allergies_lower; None if unavailable or for short allergy lists
+    _allergy_automaton: Any = field(init=False, repr=False, compare=False, default=None)
 
-@dataclass
+    def __post_init__(self):
+        self._sync_allergy_cache()
+
+    def _sync_allergy_cache(self) -> None:
+        """
+        Rebuild the cached allergy data if `allergies` changed since it was last built.
+        """
+        allergies = tuple(self.allergies)
+        if allergies == self._allergies_src:
+            return
+        self._allergies_src = allergies
+        self._allergies_lower = tuple(a.lower() for a in allergies)
+        self._allergy_automaton = None
+        # below _AUTOMATON_MIN_ALLERGIES the substring loop is cheaper than building and scanning;
+        # empty allergy strings can't be added to the automaton, so keep the loop for them too
+        if (ahocorasick is not None and len(allergies) >= _AUTOMATON_MIN_ALLERGIES
+                and all(self._allergies_lower)):
+            automaton = ahocorasick.Automaton()
+            # reversed so that the first listed allergy wins for repeated entries
+            for i in reversed(range(len(allergies))):
+                automaton.add_word(self._allergies_lower[i], (i, allergies[i]))
+            automaton.make_automaton()
+            self._allergy_automaton = automaton
+
+@dataclass(slots=True)
 class Medication:
     rxnorm: Optional[str]
     name: str
@@ -32,19 +93,76 @@ class Medication:
     max_single_mg: Optional[float] = None
     notes: Optional[str] = None
     renal_adjustment: Optional[Dict[str, Any]] = None  # custom rules
+    # lowercased name, cached once for the safety checks
+    _name_lower: str = field(init=False, repr=False, compare=False)
+    # renal_adjustment normalized to one dose per eGFR category (None = no rule)
+    renal_adjustment_vec: Optional[Tuple[Optional[str], ...]] = field(init=False, repr=False, compare=False)
+    # position in DRUG_DB (row of DOSE_TABLE); -1 for medications outside the DB
+    drug_idx: int = field(init=False, repr=False, compare=False, default=-1)
+
+    def __post_init__(self):
+        self._name_lower = sys.intern(self.name.lower())
+        rules = self.renal_adjustment
+        self.renal_adjustment_vec = tuple(rules.get(label) for label in EGFR_LABELS) if rules else None
 
-@dataclass
+@dataclass(slots=True)
 class Suggestion:
     med: Medication
     suggested_dose: str
     rationale: str
     warnings: List[str]
+    current_meds_str: str = ""  # ", "-joined names of the current meds screened against
+
+@dataclass(slots=True)
+class PatientBatch:
+    """
+    Structure-of-arrays view of a patient cohort for vectorized screening.
+    Missing weight/creatinine are stored as NaN.
+    """
+    ids: List[str]
+    age: np.ndarray          # int16, years
+    weight_kg: np.ndarray    # float64 (same precision as the scalar path)
+    scr: np.ndarray          # float64, serum creatinine mg/dL
+    sex_female: np.ndarray   # bool_
+    allergies: List[FrozenSet[str]]  # lowercased
+
+    @classmethod
+    def from_patients(cls, patients: List[Patient]) -> "PatientBatch":
+        nan = float("nan")
+        for p in patients:
+            p._sync_allergy_cache()
+        return cls(
+            ids=[p.id for p in patients],
+            age=np.array([p.age for p in patients], dtype=np.int16),
+            weight_kg=np.array([nan if p.weight_kg is None else p.weight_kg for p in patients],
+                               dtype=np.float64),
+            scr=np.array([nan if p.serum_creatinine_mg_dl is None else p.serum_creatinine_mg_dl
+                          for p in patients], dtype=np.float64),
+            sex_female=np.array([p.sex.upper() == "F" for p in patients], dtype=np.bool_),
+            allergies=[frozenset(p._allergies_lower) for p in patients],
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def creatinine_clearance(self) -> np.ndarray:
+        """
+        Cockcroft-Gault CrCl (mL/min, 1 decimal) per patient; NaN where data is missing.
+        """
+        crcl_batch = estimate_crcl_batch if _aot_kernels is None else _aot_kernels.crcl_batch
+        out = np.empty(len(self), dtype=np.float64)
+        crcl_batch(self.age, self.weight_kg, self.scr, self.sex_female, out)
+        return out
+
+    def egfr_categories(self) -> np.ndarray:
+        categorize = categorize_egfr_batch if _aot_kernels is None else _aot_kernels.categorize_egfr_batch
+        return categorize(self.creatinine_clearance())
 
 
 # ----------------------------
 # Small drug database (example)
 # ----------------------------
-DRUG_DB: Dict[str, Medication] = {
+DRUG_DB: Mapping[str, Medication] = {
     "amoxicillin": Medication(
         rxnorm="0001",
         name="Amoxicillin",
@@ -81,69 +199,248 @@ DRUG_DB: Dict[str, Medication] = {
         }
     )
 }
+# intern the canonical lowercase keys so lookups against _name_lower hit the identity fast path;
+# read-only so the table can be shared safely
+DRUG_DB = MappingProxyType({sys.intern(k.lower()): v for k, v in DRUG_DB.items()})
+
+# Flat (suggested_dose, rationale suffix) table indexed by drug_idx * N_EGFR_CATS + eGFR category,
+# so dose selection is a single lookup; the suffix is None when the standard dose applies
+DOSE_TABLE: List[Tuple[str, Optional[str]]] = []
+for _idx, _med in enumerate(DRUG_DB.values()):
+    _med.drug_idx = _idx
+    for _cat, _label in enumerate(EGFR_LABELS):
+        _dose = _med.renal_adjustment_vec[_cat] if _med.renal_adjustment_vec else None
+        if _dose is None:
+            DOSE_TABLE.append((_med.standard_dose, None))
+        else:
+            DOSE_TABLE.append((_dose, f"Renal adjustment applied for {_label}: {_dose}"))
+del _idx, _med, _cat, _label, _dose
 
 # ----------------------------
 # Utility: eGFR estimator (Cockcroft-Gault for creatinine clearance)
 # (This is a simple implementation for demo only.)
 # ----------------------------
+def _crcl_formula(age, weight, scr, female):
+    # plain Python for single patients (a JIT dispatch costs more than the arithmetic);
+    # the batch kernel compiles it as _crcl_kernel.
+    # written so NaN (missing batch inputs) also fails; floor() is undefined for NaN
+    if not (scr > 0 and weight > 0 and age >= 0):
+        return math.nan
+    base = ((140 - age) * weight) / (72 * scr)
+    if female:
+        base *= 0.85
+    scaled = base * 10
+    # floor() of inf raises in Python and wraps to int64 min under numba
+    if not math.isfinite(scaled):
+        return math.nan
+    # one decimal, round half up (round() doesn't lower cleanly under numba)
+    return math.floor(scaled + 0.5) / 10.0
+
+_crcl_kernel = njit(cache=True)(_crcl_formula)
+
+@njit(parallel=True, cache=True)
+def estimate_crcl_batch(age, weight, scr, female_mask, out):
+    """
+    Cockcroft-Gault over cohort arrays; writes mL/min (1 decimal) into `out`,
+    NaN where inputs are missing or out of range.
+    """
+    for i in prange(age.shape[0]):
+        out[i] = _crcl_kernel(age[i], weight[i], scr[i], female_mask[i])
+
 def estimate_creatinine_clearance(patient: Patient) -> Optional[float]:
     """
     Returns estimated creatinine clearance (mL/min) using Cockcroft-Gault.
-    Requires weight_kg and serum_creatinine_mg_dl.
+    Requires weight_kg and serum_creatinine_mg_dl; None if either is missing, or if
+    weight/creatinine are not positive or age is negative.
     """
-    if patient.serum_creatinine_mg_dl is None or patient.weight_kg is None:
+    return _estimate_crcl(patient.age, patient.sex, patient.weight_kg, patient.serum_creatinine_mg_dl)
+
+def _estimate_crcl(age: int, sex: str, weight_kg: Optional[float], scr: Optional[float]) -> Optional[float]:
+    if scr is None or weight_kg is None:
         return None
     # Cockcroft-Gault:
     # men: ((140 - age) * weight_kg) / (72 * Scr)
     # women: multiply result by 0.85
-    try:
-        scr = patient.serum_creatinine_mg_dl
-        base = ((140 - patient.age) * patient.weight_kg) / (72 * scr)
-        if patient.sex.upper() == "F":
-            base *= 0.85
-        return round(base, 1)
-    except Exception:
-        return None
+    ccr = _crcl_formula(age, weight_kg, scr, sex.upper() == "F")
+    return None if math.isnan(ccr) else ccr
 
-def categorize_egfr(ccr: Optional[float]) -> Optional[str]:
+def categorize_egfr(ccr: Optional[float]) -> Optional[int]:
     if ccr is None:
         return None
     if ccr >= 50:
-        return "eGFR>=50"
+        return EGFR_HIGH
     if 30 <= ccr < 50:
-        return "30-49"
+        return EGFR_MID
     if ccr < 30:
-        return "<30"
+        return EGFR_LOW
     return None
 
+_EGFR_EDGES = np.array([30.0, 50.0])  # category boundaries, ascending
+
+@njit(cache=True)
+def categorize_egfr_batch(ccr: np.ndarray) -> np.ndarray:
+    """
+    Vectorized categorize_egfr; EGFR_UNKNOWN where ccr is NaN.
+    """
+    # number of edges <= ccr: 0 -> EGFR_LOW, 1 -> EGFR_MID, 2 -> EGFR_HIGH
+    cats = EGFR_LOW - np.searchsorted(_EGFR_EDGES, ccr, side="right")
+    cats[np.isnan(ccr)] = EGFR_UNKNOWN
+    return cats
+
+def _kernel_source_hash() -> int:
+    """
+    Fingerprint of the batch kernels and the constants they use; build_kernels.py bakes it
+    into ai_prescribe_kernels so that builds from older sources are ignored.
+    """
+    funcs = (_crcl_formula, estimate_crcl_batch, categorize_egfr_batch)
+    src = "".join(inspect.getsource(getattr(f, "py_func", f)) for f in funcs)
+    src += repr((EGFR_HIGH, EGFR_MID, EGFR_LOW, EGFR_UNKNOWN, _EGFR_EDGES.tolist()))
+    return int(hashlib.sha256(src.encode()).hexdigest()[:15], 16)  # fits an int64
+
+# Ahead-of-time build of the batch kernels (see build_kernels.py). Only PatientBatch uses it,
+# with its fixed dtypes; the public kernels above stay JIT. It skips JIT warm-up but runs
+# serially (pycc can't build parallel loops).
+try:
+    import ai_prescribe_kernels as _aot_kernels
+except ImportError:
+    _aot_kernels = None
+if _aot_kernels is not None and _aot_kernels.source_hash() != _kernel_source_hash():
+    warnings.warn("ai_prescribe_kernels was built from different kernel sources; ignoring it "
+                  "(rerun build_kernels.py)")
+    _aot_kernels = None
+
 # ----------------------------
 # Safety checks
 # ----------------------------
 def check_allergy(patient: Patient, medication: Medication) -> Optional[str]:
-    for a in patient.allergies:
-        if a.lower() in medication.name.lower():
+    patient._sync_allergy_cache()
+    automaton = patient._allergy_automaton
+    if automaton is not None:
+        # one scan of the name; report the earliest-listed matching allergy
+        hit = min((v for _, v in automaton.iter(medication._name_lower)), default=None)
+        if hit is not None:
+            return f"Allergy match: patient allergic to {hit[1]} — avoid {medication.name}"
+        return None
+    for a, a_lower in zip(patient.allergies, patient._allergies_lower):
+        if a_lower in medication._name_lower:
             return f"Allergy match: patient allergic to {a} — avoid {medication.name}"
     return None
 
+def screen_allergies(patient: Patient, meds: Optional[Iterable[Medication]] = None) -> Dict[str, str]:
+    """
+    Allergy warnings for every medication in meds (default: all of DRUG_DB), keyed by lowercased name.
+    """
+    warnings = {}
+    for med in DRUG_DB.values() if meds is None else meds:
+        warn = check_allergy(patient, med)
+        if warn:
+            warnings[med._name_lower] = warn
+    return warnings
+
 # Very simple interaction map (example). Real systems use comprehensive interaction DB.
 INTERACTION_DB = {
     ("metformin", "contrast_media"): "Hold metformin around iodinated contrast in CKD",
     ("enoxaparin", "warfarin"): "Increased bleeding risk — monitor INR & adjust"
 }
 
-def check_interactions(current_med_names: List[str], candidate: Medication) -> List[str]:
-    warnings = []
-    for cm in current_med_names:
-        key = (candidate.name.lower(), cm.lower())
-        rev_key = (cm.lower(), candidate.name.lower())
-        if key in INTERACTION_DB:
-            warnings.append(INTERACTION_DB[key])
-        elif rev_key in INTERACTION_DB:
-            warnings.append(INTERACTION_DB[rev_key])
-    return warnings
+# Per-drug adjacency view of INTERACTION_DB (both directions), built once at import
+INTERACTION_ADJ: Dict[str, Dict[str, str]] = {}
+for (_a, _b), _msg in INTERACTION_DB.items():
+    _a, _b = sys.intern(_a), sys.intern(_b)
+    INTERACTION_ADJ.setdefault(_a, {})[_b] = _msg
+    INTERACTION_ADJ.setdefault(_b, {})[_a] = _msg
+del _a, _b, _msg
+
+# Sparse adjacency matrix over INTERACTION_INDEX for multi-candidate screening. DRUG_DB entries keep
+# their drug_idx; interaction-only names (e.g. warfarin) are numbered after them. Stored values are
+# 1-based positions into INTERACTION_MESSAGES (0 = no interaction). The matrix itself (scipy) is
+# built on first use, see _interaction_matrices.
+INTERACTION_INDEX: Dict[str, int] = {k: m.drug_idx for k, m in DRUG_DB.items()}
+for _name in INTERACTION_ADJ:
+    INTERACTION_INDEX.setdefault(_name, len(INTERACTION_INDEX))
+INTERACTION_MESSAGES: List[str] = []
+_INTERACTION_CELLS: List[Tuple[int, int]] = []  # (row, col) of each INTERACTION_MESSAGES entry
+for _a, _nbrs in INTERACTION_ADJ.items():
+    for _b, _msg in _nbrs.items():
+        INTERACTION_MESSAGES.append(_msg)
+        _INTERACTION_CELLS.append((INTERACTION_INDEX[_a], INTERACTION_INDEX[_b]))
+del _name, _a, _nbrs, _b, _msg
+
+@lru_cache(maxsize=None)
+def _interaction_matrices():
+    """
+    (INTERACTION_CSR, 0/1 pattern of its DRUG_DB rows), built once on first use so that
+    importing demo28 doesn't pay for scipy.
+    """
+    from scipy.sparse import csr_matrix
+
+    rows, cols = zip(*_INTERACTION_CELLS) if _INTERACTION_CELLS else ((), ())
+    csr = csr_matrix(
+        (np.arange(1, len(INTERACTION_MESSAGES) + 1, dtype=np.int32), (rows, cols)),
+        shape=(len(INTERACTION_INDEX), len(INTERACTION_INDEX)),
+    )
+    return csr, (csr[:len(DRUG_DB)] != 0).astype(np.int32)
+
+def __getattr__(name: str):
+    # INTERACTION_CSR stays importable as a module attribute, built lazily
+    if name == "INTERACTION_CSR":
+        return _interaction_matrices()[0]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def interaction_indices(meds: Iterable[Medication]) -> np.ndarray:
+    """
+    INTERACTION_INDEX positions of meds; meds outside the index (not in DRUG_DB, no known interactions)
+    are dropped.
+    """
+    return np.array([INTERACTION_INDEX[m._name_lower] for m in meds if m._name_lower in INTERACTION_INDEX],
+                    dtype=np.intp)
+
+def screen_interactions(candidate: Medication, current_idx: np.ndarray) -> List[str]:
+    """
+    Interaction warnings between one candidate and the current meds (INTERACTION_INDEX positions),
+    in current_idx order. Candidates outside INTERACTION_INDEX have no known interactions.
+    """
+    candidate_idx = INTERACTION_INDEX.get(candidate._name_lower)
+    if candidate_idx is None:
+        return []
+    csr, _ = _interaction_matrices()
+    codes = csr[candidate_idx, current_idx].toarray().ravel()
+    return [INTERACTION_MESSAGES[c - 1] for c in codes[codes.nonzero()]]
+
+def formulary_interaction_counts(current_idx: np.ndarray) -> np.ndarray:
+    """
+    Number of interacting current meds for every DRUG_DB entry (indexed by drug_idx), via one SpMV.
+    Repeated current meds count once per occurrence, like check_interactions.
+    """
+    csr, formulary_pattern = _interaction_matrices()
+    current_counts = np.bincount(current_idx, minlength=csr.shape[1]).astype(np.int32)
+    return formulary_pattern @ current_counts
 
-def is_duplicate(current_med_names: List[str], candidate: Medication) -> bool:
-    return candidate.name.lower() in [m.lower() for m in current_med_names]
+def check_interactions(current_lower: Iterable[str], candidate_lower: str) -> List[str]:
+    adj = INTERACTION_ADJ.get(candidate_lower)
+    return [adj[cm] for cm in current_lower if cm in adj] if adj else []
+
+def is_duplicate(current_lower: Collection[str], candidate: Medication) -> bool:
+    return candidate._name_lower in current_lower
+
+_NO_INTERACTIONS: Dict[str, str] = {}
+
+def _scan_current(current: Iterable[Tuple[str, str]], candidate_lower: str) -> Tuple[bool, List[str], str]:
+    """
+    Single pass over current meds, given as (name, lowercased name) pairs:
+    duplicate flag, interaction warnings and joined names.
+    """
+    dup = False
+    warns: List[str] = []
+    names: List[str] = []
+    adj = INTERACTION_ADJ.get(candidate_lower, _NO_INTERACTIONS)
+    for name, nl in current:
+        if nl == candidate_lower:
+            dup = True
+        if nl in adj:
+            warns.append(adj[nl])
+        names.append(name)
+    return dup, warns, ", ".join(names)
 
 # ----------------------------
 # Core suggestion engine
@@ -151,70 +448,103 @@ def is_duplicate(current_med_names: List[str], candidate: Medication) -> bool:
 def suggest_medication(patient: Patient, candidate_key: str, current_meds: List[Medication]) -> Suggestion:
     """
     Main deterministic suggestion generator.
+    Everything except the allergy check is memoized on the inputs it depends on; each call
+    still returns a new Suggestion with its own warnings list.
     """
-    if candidate_key.lower() not in DRUG_DB:
+    candidate_lower = candidate_key.lower()
+    med = DRUG_DB.get(candidate_lower)
+    if med is None:
         raise ValueError("Medication not in DB")
-    med = DRUG_DB[candidate_key.lower()]
 
-    log_warnings: List[str] = []
-    # allergy
+    # allergy (outside the memo: uses the automaton cached on the caller's Patient)
     allergy_warn = check_allergy(patient, med)
-    if allergy_warn:
-        log_warnings.append(allergy_warn)
 
-    # duplicate
-    if is_duplicate([m.name for m in current_meds], med):
-        log_warnings.append(f"Duplicate therapy: patient is already on {med.name}")
+    suggested_dose, rationale, other_warnings, current_meds_str = _suggest_cached(
+        candidate_lower, patient.age, patient.sex, patient.weight_kg, patient.serum_creatinine_mg_dl,
+        tuple((m.name, m._name_lower) for m in current_meds)
+    )
+    log_warnings = [allergy_warn, *other_warnings] if allergy_warn else list(other_warnings)
+
+    return Suggestion(
+        med=med,
+        suggested_dose=suggested_dose,
+        rationale=rationale,
+        warnings=log_warnings,
+        current_meds_str=current_meds_str
+    )
 
-    # interactions
-    interaction_warnings = check_interactions([m.name for m in current_meds], med)
+@lru_cache(maxsize=4096)
+def _suggest_cached(candidate_lower: str, age: int, sex: str, weight_kg: Optional[float],
+                    scr: Optional[float], current: Tuple[Tuple[str, str], ...]
+                    ) -> Tuple[str, str, Tuple[str, ...], str]:
+    """
+    Patient-allergy-independent part of suggest_medication, as an immutable
+    (suggested_dose, rationale, warnings, current_meds_str) record.
+    """
+    med = DRUG_DB[candidate_lower]
+    log_warnings: List[str] = []
+
+    # duplicate + interactions (one pass over current meds)
+    duplicate, interaction_warnings, current_meds_str = _scan_current(current, med._name_lower)
+    if duplicate:
+        log_warnings.append(f"Duplicate therapy: patient is already on {med.name}")
     log_warnings.extend(interaction_warnings)
 
     # renal adjustment
-    ccr = estimate_creatinine_clearance(patient)
+    ccr = _estimate_crcl(age, sex, weight_kg, scr)
     egfr_cat = categorize_egfr(ccr)
-    suggested_dose = med.standard_dose
-    rationale_parts = [f"Standard dose: {med.standard_dose}"]
-    if egfr_cat and med.renal_adjustment:
-        adj_rules = med.renal_adjustment
-        if egfr_cat in adj_rules:
-            suggested_dose = adj_rules[egfr_cat]
-            rationale_parts.append(f"Renal adjustment applied for {egfr_cat}: {adj_rules[egfr_cat]}")
-        else:
-            # fallback - try to match ranges like "30-49"
-            for k,v in adj_rules.items():
-                if "-" in k and egfr_cat == k:
-                    suggested_dose = v
-                    rationale_parts.append(f"Renal adjustment applied for {k}: {v}")
+    adjustment_line: Optional[str]
+    if egfr_cat is not None:
+        suggested_dose, adjustment_line = DOSE_TABLE[med.drug_idx * N_EGFR_CATS + egfr_cat]
     else:
-        if med.renal_adjustment:
-            rationale_parts.append("Renal adjustment possible but missing patient creatinine/weight — clinician review needed")
+        suggested_dose = med.standard_dose
+        adjustment_line = None
+        if med.renal_adjustment_vec:
+            if weight_kg is None or scr is None:
+                adjustment_line = "Renal adjustment possible but missing patient creatinine/weight — clinician review needed"
+            else:
+                adjustment_line = "Renal adjustment possible but patient creatinine/weight/age invalid — clinician review needed"
 
-    rationale = "; ".join(rationale_parts)
+    if adjustment_line is None:
+        rationale = f"Standard dose: {med.standard_dose}"
+    else:
+        rationale = f"Standard dose: {med.standard_dose}; {adjustment_line}"
     # final warnings summary
     if ccr is not None:
         log_warnings.append(f"Estimated CrCl (Cockcroft-Gault): {ccr} mL/min")
 
-    return Suggestion(
-        med=med,
-        suggested_dose=suggested_dose,
-        rationale=rationale,
-        warnings=log_warnings
-    )
+    return suggested_dose, rationale, tuple(log_warnings), current_meds_str
 
 # ----------------------------
 # LLM helper (mock)
 # ----------------------------
-def build_llm_prompt(patient: Patient, suggestion: Suggestion, current_meds: List[Medication]) -> str:
+@lru_cache(maxsize=1024, typed=True)  # typed: 60 and 60.0 must not share an entry
+def _patient_prefix(age: int, sex: str, weight_kg: Optional[float], scr: Optional[float],
+                    allergies: Tuple[str, ...], meds_list: str) -> str:
+    """
+    Patient/current-meds part of the LLM prompt, reused across candidate medications.
+    """
+    return (
+        f"Patient: age {age}, sex {sex}, weight {weight_kg} kg, "
+        f"serum_creatinine {scr} mg/dL, allergies {list(allergies)}.\n"
+        f"Current medications: {meds_list}.\n"
+    )
+
+def build_llm_prompt(patient: Patient, suggestion: Suggestion,
+                     current_meds: Optional[List[Medication]] = None) -> str:
     """
     Build a compact prompt to ask an LLM for an explanatory rationale.
+    If current_meds is omitted, the names captured by suggest_medication are reused.
     NOTE: This function only builds a prompt. Do NOT send PHI to any third-party LLM unless policy & consent allow.
     """
-    meds_list = ", ".join([m.name for m in current_meds]) or "None"
-    prompt = (
-        f"Patient: age {patient.age}, sex {patient.sex}, weight {patient.weight_kg} kg, "
-        f"serum_creatinine {patient.serum_creatinine_mg_dl} mg/dL, allergies {patient.allergies}.\n"
-        f"Current medications: {meds_list}.\n"
+    if current_meds is None:
+        meds_list = suggestion.current_meds_str or "None"
+    else:
+        meds_list = ", ".join(m.name for m in current_meds) or "None"
+    prompt = _patient_prefix(
+        patient.age, patient.sex, patient.weight_kg, patient.serum_creatinine_mg_dl,
+        tuple(patient.allergies), meds_list
+    ) + (
         f"Suggesting: {suggestion.med.name} -> {suggestion.suggested_dose}.\n"
         f"Rationale so far: {suggestion.rationale}.\n"
         "Provide a short clinician-facing rationale and list 3 monitoring items and 2 alternative options.\n"
@@ -245,7 +575,7 @@ def demo():
     suggestion = suggest_medication(p, "enoxaparin", current)
 
     # build prompt for LLM explanation (mock)
-    prompt = build_llm_prompt(p, suggestion, current)
+    prompt = build_llm_prompt(p, suggestion)
 
     # print results
     print("=== Suggestion Summary ===")
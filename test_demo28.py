@@ -0,0 +1,214 @@
+"""
+Consistency checks for the batch/screening helpers in demo28.py against the
+single-patient functions they accelerate.
+"""
+
+import itertools
+import math
+
+import numpy as np
+
+import demo28 as d
+
+
+def _cohort():
+    patients = [
+        # CrCl lands exactly on a category edge (50.0 / 30.0)
+        d.Patient(id="edge50", age=68, sex="F", weight_kg=99.9, serum_creatinine_mg_dl=1.7),
+        d.Patient(id="edge30", age=68, sex="F", weight_kg=59.9, serum_creatinine_mg_dl=1.7),
+        d.Patient(id="no_weight", age=60, sex="F", serum_creatinine_mg_dl=1.0),
+        d.Patient(id="no_scr", age=60, sex="M", weight_kg=70),
+        d.Patient(id="zero_scr", age=60, sex="F", weight_kg=70, serum_creatinine_mg_dl=0.0),
+        d.Patient(id="neg_age", age=-1, sex="M", weight_kg=70, serum_creatinine_mg_dl=1.0),
+        # CrCl overflows to inf (or inf * 0 = NaN at age 140)
+        d.Patient(id="inf_weight", age=60, sex="M", weight_kg=float("inf"), serum_creatinine_mg_dl=1.0),
+        d.Patient(id="inf_weight_140", age=140, sex="M", weight_kg=float("inf"), serum_creatinine_mg_dl=1.0),
+        d.Patient(id="tiny_scr", age=60, sex="F", weight_kg=70, serum_creatinine_mg_dl=1e-310),
+        d.Patient(id="huge_weight", age=60, sex="M", weight_kg=1e307, serum_creatinine_mg_dl=1.0),
+    ]
+    grid = itertools.product((18, 45, 72, 95), ("M", "F"), (40, 59.9, 75.5, 99.9, 130),
+                             (0.5, 0.9, 1.3, 1.7, 2.6, 4.0))
+    for i, (age, sex, weight, scr) in enumerate(grid):
+        patients.append(d.Patient(id=f"g{i}", age=age, sex=sex, weight_kg=weight,
+                                  serum_creatinine_mg_dl=scr))
+    return patients
+
+
+def test_batch_crcl_matches_scalar():
+    patients = _cohort()
+    ccr = d.PatientBatch.from_patients(patients).creatinine_clearance()
+    for p, batch_value in zip(patients, ccr):
+        expected = d.estimate_creatinine_clearance(p)
+        if p.id.startswith(("inf_", "tiny_", "huge_")):
+            assert expected is None, p.id
+        if expected is None:
+            assert math.isnan(batch_value), p.id
+        else:
+            assert batch_value == expected, p.id
+
+
+def test_crcl_rounds_half_up_in_scalar_and_batch():
+    # age 139, scr 1.0, male: CrCl is weight / 72, exactly half-way for these weights;
+    # age 141 gives -0.005, which rounds to +0.0 (round() gave 4.2, 1.2, 0.2, 2.2, -0.0)
+    cases = [(139, 306, 4.3), (139, 90, 1.3), (139, 18, 0.3), (139, 162, 2.3), (141, 0.36, 0.0)]
+    patients = [d.Patient(id=str(i), age=age, sex="M", weight_kg=weight, serum_creatinine_mg_dl=1.0)
+                for i, (age, weight, _) in enumerate(cases)]
+    batch = d.PatientBatch.from_patients(patients).creatinine_clearance()
+    for p, batch_value, (_, _, expected) in zip(patients, batch, cases):
+        scalar = d.estimate_creatinine_clearance(p)
+        assert scalar == expected and math.copysign(1.0, scalar) == 1.0, p.id
+        assert batch_value == expected and math.copysign(1.0, batch_value) == 1.0, p.id
+    warning = d.suggest_medication(patients[0], "metformin", []).warnings[-1]
+    assert warning == "Estimated CrCl (Cockcroft-Gault): 4.3 mL/min"
+
+
+def test_batch_egfr_categories_match_scalar():
+    patients = _cohort()
+    cats = d.PatientBatch.from_patients(patients).egfr_categories()
+    for p, cat in zip(patients, cats):
+        expected = d.categorize_egfr(d.estimate_creatinine_clearance(p))
+        assert cat == (d.EGFR_UNKNOWN if expected is None else expected), p.id
+
+
+def test_categorize_egfr_batch_edges():
+    ccr = np.array([0.0, 29.9, 30.0, 49.9, 50.0, 120.0, np.nan])
+    cats = d.categorize_egfr_batch(ccr)
+    assert cats.tolist() == [d.EGFR_LOW, d.EGFR_LOW, d.EGFR_MID, d.EGFR_MID,
+                             d.EGFR_HIGH, d.EGFR_HIGH, d.EGFR_UNKNOWN]
+    assert cats[:-1].tolist() == [d.categorize_egfr(v) for v in ccr[:-1]]
+
+
+# long enough for check_allergy to use the Aho-Corasick automaton (when installed)
+_FILLER_ALLERGIES = [f"filler{i}" for i in range(d._AUTOMATON_MIN_ALLERGIES)]
+
+
+def test_screen_allergies_matches_check_allergy():
+    for allergies in ([], ["penicillin"], ["Cillin", "amox", "Amox", "METF"], ["enox", ""],
+                      _FILLER_ALLERGIES + ["Cillin", "amox", "Amox", "METF"]):
+        p = d.Patient(id="a", age=50, sex="M", allergies=allergies)
+        expected = {}
+        for key, med in d.DRUG_DB.items():
+            warn = d.check_allergy(p, med)
+            if warn:
+                expected[key] = warn
+        assert d.screen_allergies(p) == expected
+
+
+def test_check_allergy_reports_first_listed_allergy():
+    for allergies in (["Cillin", "amox"], _FILLER_ALLERGIES + ["Cillin", "amox"]):
+        p = d.Patient(id="a", age=50, sex="M", allergies=allergies)
+        warn = d.check_allergy(p, d.DRUG_DB["amoxicillin"])
+        assert warn == "Allergy match: patient allergic to Cillin — avoid Amoxicillin"
+
+
+def test_check_allergy_sees_allergies_changed_after_construction():
+    amox = d.DRUG_DB["amoxicillin"]
+    p = d.Patient(id="a", age=50, sex="M")
+    p.allergies.append("amox")
+    assert d.check_allergy(p, amox) == "Allergy match: patient allergic to amox — avoid Amoxicillin"
+    p.allergies = ["Cillin"]
+    assert d.check_allergy(p, amox) == "Allergy match: patient allergic to Cillin — avoid Amoxicillin"
+    p.allergies.clear()
+    assert d.check_allergy(p, amox) is None
+    p.allergies.append("AMOX")
+    warnings = d.suggest_medication(p, "amoxicillin", []).warnings
+    assert warnings[0] == "Allergy match: patient allergic to AMOX — avoid Amoxicillin"
+    assert d.PatientBatch.from_patients([p]).allergies == [frozenset({"amox"})]
+
+
+def test_allergy_automaton_follows_allergy_changes():
+    amox = d.DRUG_DB["amoxicillin"]
+    p = d.Patient(id="a", age=50, sex="M", allergies=list(_FILLER_ALLERGIES))
+    assert d.check_allergy(p, amox) is None
+    p.allergies.append("amox")
+    assert d.check_allergy(p, amox) == "Allergy match: patient allergic to amox — avoid Amoxicillin"
+    p.allergies = _FILLER_ALLERGIES + ["metf"]
+    assert d.check_allergy(p, amox) is None
+    assert d.check_allergy(p, d.DRUG_DB["metformin"]) == "Allergy match: patient allergic to metf — avoid Metformin"
+    p.allergies = ["amox"]  # back below the automaton threshold
+    assert d.check_allergy(p, amox) == "Allergy match: patient allergic to amox — avoid Amoxicillin"
+
+
+def _current_meds():
+    return [
+        d.DRUG_DB["metformin"],
+        d.Medication(rxnorm=None, name="Warfarin", standard_dose="per INR"),
+        d.Medication(rxnorm=None, name="Contrast_Media", standard_dose="per study"),
+        d.Medication(rxnorm=None, name="Unlisted", standard_dose="n/a"),
+    ]
+
+
+def test_screen_interactions_matches_check_interactions():
+    current = _current_meds()
+    current_idx = d.interaction_indices(current)
+    assert len(current_idx) == 3  # "Unlisted" is outside the index
+    current_lower = [m._name_lower for m in current]
+    for key, med in d.DRUG_DB.items():
+        assert d.screen_interactions(med, current_idx) == d.check_interactions(current_lower, key)
+    assert d.screen_interactions(d.DRUG_DB["enoxaparin"], d.interaction_indices([])) == []
+
+
+def test_screen_interactions_off_formulary_candidate():
+    enoxaparin_idx = d.interaction_indices([d.DRUG_DB["enoxaparin"]])
+    # drug_idx is -1 outside DRUG_DB; that must not alias the last matrix row
+    unlisted = d.Medication(rxnorm=None, name="Unlisted", standard_dose="n/a")
+    assert d.screen_interactions(unlisted, enoxaparin_idx) == []
+    # interaction-only names are screened through INTERACTION_INDEX
+    warfarin = d.Medication(rxnorm=None, name="Warfarin", standard_dose="per INR")
+    assert d.screen_interactions(warfarin, enoxaparin_idx) == d.check_interactions(["enoxaparin"], "warfarin")
+    assert d.screen_interactions(warfarin, enoxaparin_idx) == ["Increased bleeding risk — monitor INR & adjust"]
+
+
+def test_interaction_csr_matches_adjacency():
+    csr = d.INTERACTION_CSR  # built lazily on first access
+    assert csr.shape == (len(d.INTERACTION_INDEX),) * 2
+    for a, nbrs in d.INTERACTION_ADJ.items():
+        for b, msg in nbrs.items():
+            assert d.INTERACTION_MESSAGES[csr[d.INTERACTION_INDEX[a], d.INTERACTION_INDEX[b]] - 1] == msg
+    assert csr.nnz == sum(len(nbrs) for nbrs in d.INTERACTION_ADJ.values())
+
+
+def test_formulary_interaction_counts():
+    warfarin = d.Medication(rxnorm=None, name="Warfarin", standard_dose="per INR")
+    for current in (_current_meds(), [warfarin, warfarin], _current_meds() * 2, []):
+        counts = d.formulary_interaction_counts(d.interaction_indices(current))
+        current_lower = [m._name_lower for m in current]
+        expected = [len(d.check_interactions(current_lower, key)) for key in d.DRUG_DB]
+        assert counts.tolist() == expected
+
+
+def test_memoized_suggestions_do_not_share_warnings():
+    fields = dict(age=72, sex="F", weight_kg=60, serum_creatinine_mg_dl=1.6)
+    current = [d.DRUG_DB["metformin"]]
+    first = d.suggest_medication(d.Patient(id="A", **fields), "enoxaparin", current)
+    first.warnings.append("X")
+    second = d.suggest_medication(d.Patient(id="B", **fields), "enoxaparin", current)
+    assert "X" not in second.warnings
+    assert second.warnings is not first.warnings
+
+
+def test_memoized_suggestions_keep_allergies_per_patient():
+    fields = dict(age=72, sex="F", weight_kg=60, serum_creatinine_mg_dl=1.6)
+    allergic = d.suggest_medication(d.Patient(id="A", allergies=["amox"], **fields), "amoxicillin", [])
+    other = d.suggest_medication(d.Patient(id="B", **fields), "amoxicillin", [])
+    assert allergic.warnings[0] == "Allergy match: patient allergic to amox — avoid Amoxicillin"
+    assert allergic.warnings[1:] == other.warnings
+
+
+def test_invalid_renal_inputs_get_their_own_rationale():
+    metformin = d.DRUG_DB["metformin"]
+    invalid = "Renal adjustment possible but patient creatinine/weight/age invalid — clinician review needed"
+    missing = "Renal adjustment possible but missing patient creatinine/weight — clinician review needed"
+    for fields in (dict(weight_kg=70, serum_creatinine_mg_dl=-1.2),  # negative creatinine
+                   dict(weight_kg=70, serum_creatinine_mg_dl=0.0),
+                   dict(weight_kg=0, serum_creatinine_mg_dl=1.0),
+                   dict(weight_kg=-70, serum_creatinine_mg_dl=1.0)):
+        s = d.suggest_medication(d.Patient(id="x", age=60, sex="M", **fields), "metformin", [])
+        assert s.suggested_dose == metformin.standard_dose, fields
+        assert s.rationale == f"Standard dose: {metformin.standard_dose}; {invalid}", fields
+        assert not any(w.startswith("Estimated CrCl") for w in s.warnings), fields
+    s = d.suggest_medication(d.Patient(id="x", age=-1, sex="F", weight_kg=70, serum_creatinine_mg_dl=1.0),
+                             "metformin", [])
+    assert s.rationale.endswith(invalid)
+    s = d.suggest_medication(d.Patient(id="x", age=60, sex="F", weight_kg=70), "metformin", [])
+    assert s.rationale.endswith(missing)